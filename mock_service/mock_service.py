@@ -1,5 +1,11 @@
 from fastapi import FastAPI, HTTPException, Header, Query, Response
-from typing import Optional
+from typing import Optional, Tuple
+from functools import lru_cache
+import asyncio
+import hashlib
+import json
+import math
+import os
 import random
 import time
 from datetime import datetime
@@ -7,27 +13,62 @@ from datetime import datetime
 app = FastAPI()
 
 # fake database with 100 resources
+# seeded so every restart serves the same data (and the same etags)
+_rng = random.Random(0)
 RESOURCES = [
     {
         "id": f"res_{i}",
-        "type": random.choice(["storage", "compute", "network", "database"]),
+        "type": _rng.choice(["storage", "compute", "network", "database"]),
         "name": f"resource_{i}",
         "metadata": {
-            "region": random.choice(["us-east-1", "us-west-2", "eu-west-1"]),
+            "region": _rng.choice(["us-east-1", "us-west-2", "eu-west-1"]),
             "created_at": "2024-01-01"
         },
-        "sensitive_data": random.choice([True, False])
+        "sensitive_data": _rng.choice([True, False])
     }
     for i in range(1, 101)  # 100 sample resources
 ]
+RESOURCES_BY_ID = {r["id"]: r for r in RESOURCES}
+
+def encode_payload(payload) -> Tuple[bytes, str]:
+    # serialize once, same settings as fastapi's JSONResponse
+    body = json.dumps(payload, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+    etag = '"' + hashlib.blake2b(body, digest_size=8).hexdigest() + '"'
+    return body, etag
+
+# resources never change so encode them once at startup
+RESOURCE_PAYLOADS = {resource_id: encode_payload(r) for resource_id, r in RESOURCES_BY_ID.items()}
+
+@lru_cache(maxsize=None)
+def page_payload(page: int, limit: int) -> Tuple[bytes, str]:
+    # encoded page, built on first hit and reused after
+    start_idx = (page - 1) * limit
+    end_idx = start_idx + limit
+    total_items = len(RESOURCES)
+    total_pages = (total_items + limit - 1) // limit
+    return encode_payload({
+        "resources": RESOURCES[start_idx:end_idx],
+        "page": page,
+        "total_pages": total_pages,
+        "total_items": total_items
+    })
+
+def cached_response(payload: Tuple[bytes, str], if_none_match: Optional[str]) -> Response:
+    body, etag = payload
+    if if_none_match == etag:
+        return Response(status_code=304, headers={"ETag": etag})
+    return Response(content=body, media_type="application/json", headers={"ETag": etag})
 
 # config
 VALID_API_KEY = "valid_api_key"
 RATE_LIMIT_REQUESTS = 10
 RATE_LIMIT_WINDOW = 60  # seconds
+RATE_LIMIT_CAPACITY = RATE_LIMIT_REQUESTS  # max burst size
+RATE_LIMIT_REFILL_RATE = RATE_LIMIT_REQUESTS / RATE_LIMIT_WINDOW  # tokens per second
+SIMULATE_LATENCY = os.getenv("SIMULATE_LATENCY", "1") == "1"  # set to 0 for perf runs
 
-# rate limiting tracking
-request_history = {}
+# rate limiting tracking - api_key -> (tokens, last_refill)
+buckets = {}
 
 def check_api_key(api_key: str = Header(None)):
     if api_key != VALID_API_KEY:
@@ -35,22 +76,28 @@ def check_api_key(api_key: str = Header(None)):
     return api_key
 
 def check_rate_limit(api_key: str):
-    current_time = time.time()
-    if api_key not in request_history:
-        request_history[api_key] = []
-    
-    # clean up old requests
-    request_history[api_key] = [t for t in request_history[api_key] 
-                               if current_time - t < RATE_LIMIT_WINDOW]
+    # token bucket - constant time and memory per key
+    now = time.monotonic()
+    tokens, last_refill = buckets.get(api_key, (RATE_LIMIT_CAPACITY, now))
+    tokens = min(RATE_LIMIT_CAPACITY, tokens + (now - last_refill) * RATE_LIMIT_REFILL_RATE)
     
-    if len(request_history[api_key]) >= RATE_LIMIT_REQUESTS:
-        raise HTTPException(status_code=429, detail="Rate limit exceeded")
+    if tokens < 1:
+        buckets[api_key] = (tokens, now)
+        retry_after = math.ceil((1 - tokens) / RATE_LIMIT_REFILL_RATE)
+        raise HTTPException(
+            status_code=429,
+            detail="Rate limit exceeded",
+            headers={"Retry-After": str(retry_after)}
+        )
     
-    request_history[api_key].append(current_time)
+    buckets[api_key] = (tokens - 1, now)
 
-def simulate_latency_and_errors():
-    # add random delay
-    time.sleep(random.uniform(0.1, 0.5))
+async def simulate_latency_and_errors():
+    if not SIMULATE_LATENCY:
+        return
+    
+    # add random delay without blocking the event loop
+    await asyncio.sleep(0.1 + 0.4 * random.random())
     
     # random 500 errors 5% of the time
     if random.random() < 0.05:
@@ -64,6 +111,7 @@ async def health_check():
 async def list_resources(
     response: Response,
     api_key: str = Header(None),
+    if_none_match: Optional[str] = Header(None),
     page: int = Query(1, ge=1),
     limit: int = Query(10, ge=1, le=100)
 ):
@@ -74,33 +122,21 @@ async def list_resources(
     check_rate_limit(api_key)
     
     # simulate real api behavior
-    simulate_latency_and_errors()
-    
-    # pagination math
-    start_idx = (page - 1) * limit
-    end_idx = start_idx + limit
-    total_items = len(RESOURCES)
-    total_pages = (total_items + limit - 1) // limit
+    await simulate_latency_and_errors()
     
     # make sure page exists
+    total_pages = (len(RESOURCES) + limit - 1) // limit
     if page > total_pages:
         raise HTTPException(status_code=404, detail="Page not found")
     
-    # slice the data
-    paginated_resources = RESOURCES[start_idx:end_idx]
-    
-    return {
-        "resources": paginated_resources,
-        "page": page,
-        "total_pages": total_pages,
-        "total_items": total_items
-    }
+    return cached_response(page_payload(page, limit), if_none_match)
 
 @app.get("/resources/{resource_id}")
 async def get_resource(
     resource_id: str,
     response: Response,
-    api_key: str = Header(None)
+    api_key: str = Header(None),
+    if_none_match: Optional[str] = Header(None)
 ):
     # check auth
     check_api_key(api_key)
@@ -109,19 +145,17 @@ async def get_resource(
     check_rate_limit(api_key)
     
     # simulate real api behavior
-    simulate_latency_and_errors()
+    await simulate_latency_and_errors()
     
     # find the resource
-    resource = next(
-        (r for r in RESOURCES if r["id"] == resource_id),
-        None
-    )
+    resource = RESOURCES_BY_ID.get(resource_id)
     
     if not resource:
         raise HTTPException(status_code=404, detail="Resource not found")
     
-    return resource
+    return cached_response(RESOURCE_PAYLOADS[resource["id"]], if_none_match)
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000) 
\ No newline at end of file
+    # uvloop + httptools for throughput, access log off to skip per-request log formatting
+    uvicorn.run(app, host="0.0.0.0", port=8000, loop="uvloop", http="httptools", access_log=False) 
\ No newline at end of file
@@ -1,102 +1,205 @@
 import aiohttp
 import asyncio
 import logging
-from typing import List, Dict, Optional
+import random
+from typing import List, Dict, Optional, Tuple, Union
+import orjson
 import structlog
-from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception_type, before_sleep_log
+from yarl import URL
 import os
+from urllib.parse import quote
 from dotenv import load_dotenv
 
 # load env vars if any
 load_dotenv()
 
-# setup logging
-logger = structlog.get_logger()
+# setup logging - anything below LOG_LEVEL is dropped before formatting
+# the filtering wrapper is local to this module so we don't override the app's structlog config
+LOG_LEVEL = getattr(logging, os.getenv("LOG_LEVEL", "INFO").upper(), logging.INFO)
+DEBUG_ENABLED = LOG_LEVEL <= logging.DEBUG
+logger = structlog.wrap_logger(None, wrapper_class=structlog.make_filtering_bound_logger(LOG_LEVEL))
+
+# retry config
+MAX_ATTEMPTS = 5
+BACKOFF_MIN = 2  # seconds
+BACKOFF_MAX = 10  # seconds
+RETRY_JITTER = 0.5  # seconds of random jitter added to every retry wait
+RETRY_AFTER_MAX = 60  # seconds - longer Retry-After values fall back to backoff
 
 class CloudResourceScanner:
-    def __init__(self, base_url: str, api_key: str, max_concurrent_requests: int = 5, max_requests_per_second: float = 0.8):
+    # fixed attribute set - no per-instance __dict__
+    __slots__ = (
+        "base_url", "api_key", "max_concurrent_requests", "session", "_owns_session",
+        "_semaphore", "_loop", "_capacity", "_refill_rate", "_tokens", "_last_refill", "_etag_cache",
+        "_url_health", "_url_resources"
+    )
+
+    def __init__(self, base_url: str, api_key: str, max_concurrent_requests: int = 5, max_requests_per_second: float = 0.8,
+                 session: Optional[aiohttp.ClientSession] = None):
         self.base_url = base_url
         self.api_key = api_key
+        # endpoint urls built once - yarl urls also skip a re-parse inside aiohttp
+        self._url_health = URL(f"{base_url}/health")
+        self._url_resources = URL(f"{base_url}/resources")
         self.max_concurrent_requests = max_concurrent_requests
-        self.session: Optional[aiohttp.ClientSession] = None
+        # a session passed in is shared with other scanners, so we leave closing it to the caller
+        self.session = session
+        self._owns_session = session is None
         self._semaphore: Optional[asyncio.Semaphore] = None
-        self._rate_limit_lock = asyncio.Lock()
-        self._last_request_time = 0
-        self._min_request_interval = 1.0 / max_requests_per_second  # wait time between requests
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        # token bucket - bursts up to max_concurrent_requests, refills at max_requests_per_second
+        self._capacity = float(max_concurrent_requests)
+        self._refill_rate = max_requests_per_second
+        self._tokens = self._capacity
+        self._last_refill: Optional[float] = None
+        # (url, params) -> (etag, raw body) for conditional GETs
+        # raw bytes so every 304 parses a fresh dict that callers are free to modify
+        self._etag_cache: Dict[Tuple, Tuple[str, bytes]] = {}
 
     async def initialize(self) -> 'CloudResourceScanner':
         # setup session and semaphore
         if not self.session or self.session.closed:
-            self.session = aiohttp.ClientSession(headers={"api-key": self.api_key})
+            # single host, so size the pool to our concurrency and keep connections alive between requests
+            connector = aiohttp.TCPConnector(
+                limit=self.max_concurrent_requests,
+                limit_per_host=self.max_concurrent_requests,
+                keepalive_timeout=75,
+                enable_cleanup_closed=True,
+                ttl_dns_cache=300
+            )
+            self.session = aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=30))
+            self._owns_session = True
         if not self._semaphore:
             self._semaphore = asyncio.Semaphore(self.max_concurrent_requests)
-        logger.info("scanner_initialized", base_url=self.base_url, max_rps=1.0/self._min_request_interval)
+        # cached so the rate limiter doesn't look the loop up on every request
+        self._loop = asyncio.get_running_loop()
+        logger.info("scanner_initialized", base_url=self.base_url, max_rps=self._refill_rate, burst=self._capacity)
         return self
 
     async def close(self) -> None:
-        # cleanup session
-        if self.session and not self.session.closed:
+        # cleanup session if it's ours
+        if self._owns_session and self.session and not self.session.closed:
             await self.session.close()
             self.session = None
         logger.info("scanner_closed")
 
-    @retry(
-        retry=retry_if_exception_type((aiohttp.ClientResponseError, aiohttp.ServerDisconnectedError)),
-        wait=wait_exponential(multiplier=1, min=2, max=10),
-        stop=stop_after_attempt(5),
-        before_sleep=before_sleep_log(logger, logging.WARNING),
-        reraise=True
-    )
-    async def _make_request(self, endpoint: str, params: Optional[Dict] = None) -> Dict:
-        # main request handler with rate limiting and retries
-        logger.info("http_request_start", endpoint=endpoint, params=params)
+    @staticmethod
+    def _backoff(attempt: int) -> float:
+        # exponential backoff clamped to [BACKOFF_MIN, BACKOFF_MAX]
+        return min(BACKOFF_MAX, max(BACKOFF_MIN, 2 ** attempt))
+
+    @staticmethod
+    def _retry_after(e: aiohttp.ClientResponseError) -> Optional[int]:
+        # integer seconds form of Retry-After only, within [0, RETRY_AFTER_MAX]
+        # anything else (dates, floats, "inf", huge values) falls back to backoff
+        value = e.headers.get("Retry-After") if e.headers else None
+        try:
+            seconds = int(value)
+        except (TypeError, ValueError):
+            return None
+        if 0 <= seconds <= RETRY_AFTER_MAX:
+            return seconds
+        return None
+
+    async def _make_request(self, endpoint: str, url: URL, params: Optional[Dict] = None) -> Dict:
+        # endpoint is only a label for logs, url is what gets requested
+        # retry wrapper - 429 waits for Retry-After, 5xx and disconnects back off exponentially
+        attempt = 1
+        while True:
+            try:
+                result = await self._send_request(endpoint, url, params)
+            except aiohttp.ServerDisconnectedError as e:
+                logger.warning("server_disconnected", endpoint=endpoint, error=str(e))
+                if attempt >= MAX_ATTEMPTS:
+                    raise
+                sleep_time = self._backoff(attempt)
+            else:
+                if not isinstance(result, aiohttp.ClientResponseError):
+                    return result
+                if attempt >= MAX_ATTEMPTS:
+                    raise result
+                sleep_time = self._retry_after(result) if result.status == 429 else None
+                if sleep_time is None:
+                    sleep_time = self._backoff(attempt)
+            
+            sleep_time += random.uniform(0, RETRY_JITTER)
+            logger.warning("retrying_request", endpoint=endpoint, attempt=attempt, sleep_time=round(sleep_time, 2))
+            await asyncio.sleep(sleep_time)
+            attempt += 1
+
+    async def _send_request(self, endpoint: str, url: URL, params: Optional[Dict] = None) -> Union[Dict, aiohttp.ClientResponseError]:
+        # single request attempt with rate limiting
+        # retryable errors (429/5xx) are returned rather than raised, 401/404 etc are raised
+        # debug logs are guarded so the kwargs aren't built when debug is off
+        if DEBUG_ENABLED:
+            logger.debug("http_request_start", endpoint=endpoint, params=params)
         
+        if not self.session or self.session.closed or not self._loop:
+            await self.initialize()
+
         # rate limiting - make sure we don't hit limits
-        async with self._rate_limit_lock:
-            current_time = asyncio.get_event_loop().time()
-            time_since_last = current_time - self._last_request_time
-            if time_since_last < self._min_request_interval:
-                sleep_time = self._min_request_interval - time_since_last
+        # no lock needed: nothing awaits between reading and updating the bucket, so each
+        # caller takes its token (going into debt if empty) and then sleeps off its own debt
+        current_time = self._loop.time()
+        if self._last_refill is not None:
+            elapsed = current_time - self._last_refill
+            self._tokens = min(self._capacity, self._tokens + elapsed * self._refill_rate)
+        self._last_refill = current_time
+        self._tokens -= 1
+        if self._tokens < 0:
+            sleep_time = -self._tokens / self._refill_rate
+            if DEBUG_ENABLED:
                 logger.debug("rate_limiting_sleep", sleep_time=sleep_time)
-                await asyncio.sleep(sleep_time)
-            self._last_request_time = asyncio.get_event_loop().time()
+            await asyncio.sleep(sleep_time)
 
-        if not self.session or self.session.closed:
-            await self.initialize()
+        cache_key = (url, tuple(sorted(params.items())) if params else ())
+        cached = self._etag_cache.get(cache_key)
+        # api key goes on each request since the session may be shared between keys
+        headers = {"api-key": self.api_key}
+        if cached:
+            headers["If-None-Match"] = cached[0]
 
         async with self._semaphore:
-            try:
-                async with self.session.get(f"{self.base_url}{endpoint}", params=params) as response:
-                    logger.info("http_response", endpoint=endpoint, status=response.status)
-                    
-                    if response.status == 429:
+            async with self.session.get(url, params=params, headers=headers) as response:
+                status = response.status
+                if status == 304 and cached:
+                    logger.info("http_not_modified", endpoint=endpoint)
+                    return orjson.loads(cached[1])
+                
+                if status >= 400:
+                    if status == 429:
                         logger.warning("rate_limit_exceeded", endpoint=endpoint, retry_after=response.headers.get('Retry-After'))
-                    elif response.status == 401:
+                    elif status == 401:
                         logger.error("authentication_failed", endpoint=endpoint)
-                    elif response.status == 404:
-                        logger.warning("resource_not_found", endpoint=endpoint)
+                    elif status == 404:
+                        logger.warning("resource_not_found", endpoint=endpoint, url=str(url))
+                    else:
+                        logger.warning("http_error", endpoint=endpoint, status=status, message=response.reason)
                     
-                    response.raise_for_status()
-                    result = await response.json()
-                    logger.info("http_request_success", endpoint=endpoint, response_size=len(str(result)))
-                    return result
-                    
-            except aiohttp.ClientResponseError as e:
-                logger.warning("http_error", endpoint=endpoint, status=e.status, message=str(e))
-                if e.status in [401, 404]:
-                    # don't retry these - they won't get better
-                    raise
-                else:
-                    # let tenacity handle retries
-                    raise
-            except aiohttp.ServerDisconnectedError as e:
-                logger.warning("server_disconnected", endpoint=endpoint, error=str(e))
-                raise
+                    error = aiohttp.ClientResponseError(
+                        response.request_info,
+                        response.history,
+                        status=status,
+                        message=response.reason or "",
+                        headers=response.headers
+                    )
+                    if status == 429 or status >= 500:
+                        return error
+                    # 401/404 etc won't get better, don't retry
+                    raise error
+                
+                body = await response.read()
+                result = orjson.loads(body)
+                etag = response.headers.get("ETag")
+                if etag:
+                    self._etag_cache[cache_key] = (etag, body)
+                logger.info("http_ok", endpoint=endpoint, status=status, bytes=len(body))
+                return result
 
     async def check_health(self) -> bool:
         # basic health check
         try:
-            response = await self._make_request("/health")
+            response = await self._make_request("/health", self._url_health)
             is_healthy = response.get("status") == "healthy"
             logger.info("health_check_result", healthy=is_healthy)
             return is_healthy
@@ -107,45 +210,78 @@ class CloudResourceScanner:
     async def list_resources(self, page: int = 1, limit: int = 10) -> Dict:
         # get paginated resource list
         logger.info("listing_resources", page=page, limit=limit)
-        return await self._make_request("/resources", params={"page": page, "limit": limit})
+        return await self._make_request("/resources", self._url_resources, params={"page": page, "limit": limit})
 
     async def get_resource(self, resource_id: str) -> Dict:
         # fetch single resource by id
+        # the id is always sent as one literal path segment: "/", "%", spaces etc are percent-encoded
+        # (so "res%2F1" is looked up as exactly that string) and "." / ".." aren't treated as dots
+        if not resource_id:
+            raise ValueError("resource_id must be a non-empty string")
         logger.info("fetching_resource", resource_id=resource_id)
-        return await self._make_request(f"/resources/{resource_id}")
+        segment = quote(resource_id, safe="")
+        if segment in (".", ".."):
+            segment = segment.replace(".", "%2E")
+        return await self._make_request("/resources/{resource_id}", self._url_resources.joinpath(segment, encoded=True))
+
+    @staticmethod
+    async def _discard(task: asyncio.Future) -> None:
+        # cancel a request we no longer need and swallow its outcome so nothing is left unretrieved
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
 
     async def scan_all_resources(self) -> List[Dict]:
         # get everything across all pages
         logger.info("starting_full_scan")
         
-        # get first page to see how many total pages
-        first_page = await self.list_resources(page=1)
+        # get first page to see how many total pages - page 2 goes out alongside it as its own
+        # task since with the default page size there's almost always more than one page
+        limit = 10
+        second_page = asyncio.ensure_future(self.list_resources(page=2, limit=limit))
+        try:
+            first_page = await self.list_resources(page=1, limit=limit)
+        except BaseException:
+            await self._discard(second_page)
+            raise
         total_pages = first_page["total_pages"]
         
-        all_resources = first_page["resources"]
-        logger.info("scan_progress", current_resources=len(all_resources), total_pages=total_pages)
+        # preallocate and write each page into its own slice, so results land in page order
+        all_resources: List[Optional[Dict]] = [None] * first_page["total_items"]
+        missing_pages = False
+
+        def store_page(page_num: int, result: Dict) -> None:
+            start = (page_num - 1) * limit
+            resources = result["resources"]
+            all_resources[start:start + len(resources)] = resources
+
+        store_page(1, first_page)
+        logger.info("scan_progress", current_resources=len(first_page["resources"]), total_pages=total_pages)
         
-        if total_pages > 1:
-            # fetch remaining pages concurrently but controlled
-            async def fetch_page(page_num):
+        if total_pages == 1:
+            # speculative page 2 isn't needed
+            await self._discard(second_page)
+        else:
+            # fetch remaining pages concurrently - the semaphore in _send_request caps in-flight requests
+            # page 2 is already in flight, so pages 3..N don't wait on it (or its retries)
+            async def fetch_page(page_num, request):
                 try:
-                    result = await self.list_resources(page=page_num)
-                    logger.debug("page_fetched", page=page_num, resources=len(result.get("resources", [])))
-                    return result
+                    result = await request
+                    if DEBUG_ENABLED:
+                        logger.debug("page_fetched", page=page_num, resources=len(result.get("resources", [])))
+                    store_page(page_num, result)
+                    return True
                 except Exception as e:
                     logger.error("page_fetch_error", page=page_num, error=str(e))
-                    return None
-
-            # batch requests to avoid overwhelming server
-            for i in range(2, total_pages + 1, min(3, self.max_concurrent_requests)):
-                page_numbers = range(i, min(i + 3, total_pages + 1))
-                logger.info("fetching_page_batch", pages=list(page_numbers))
-                tasks = [fetch_page(page) for page in page_numbers]
-                results = await asyncio.gather(*tasks, return_exceptions=True)
-                
-                for result in results:
-                    if isinstance(result, dict) and "resources" in result:
-                        all_resources.extend(result["resources"])
+                    return False
+
+            tasks = [fetch_page(2, second_page)]
+            tasks += [fetch_page(page, self.list_resources(page=page, limit=limit)) for page in range(3, total_pages + 1)]
+            results = await asyncio.gather(*tasks)
+            missing_pages = not all(results)
+
+        if missing_pages:
+            # drop the slots of pages we couldn't fetch
+            all_resources = [r for r in all_resources if r is not None]
 
         logger.info("scan_completed", total_resources=len(all_resources), total_pages=total_pages)
         return all_resources
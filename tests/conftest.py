@@ -6,12 +6,12 @@ import aiohttp
 from tenacity import RetryError
 from scanner import CloudResourceScanner
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def base_url():
     # use env var or default to docker-compose service name
     return os.getenv("BASE_URL", "http://mock-service:8000")
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def api_key():
     return "valid_api_key"
 
@@ -24,16 +24,26 @@ def handle_rate_limit_skip(e: Exception, test_name: str):
     elif isinstance(e, aiohttp.ClientResponseError) and e.status == 429:
         pytest.skip(f"{test_name} skipped due to rate limiting")
 
-@pytest_asyncio.fixture
-async def scanner_factory(base_url):
-    # factory to create scanners and clean them up
+@pytest_asyncio.fixture(scope="session")
+async def _session_scanner_pool():
+    # one connection pool for all scanners - avoids a new handshake per test
+    connector = aiohttp.TCPConnector(limit=10, keepalive_timeout=75)
+    session = aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=30))
+    yield session
+    await session.close()
+
+@pytest_asyncio.fixture(scope="session")
+async def scanner_factory(base_url, _session_scanner_pool):
+    # factory to create scanners on the shared session and clean them up at the end of the run
+    # session scoped because pytest-asyncio 0.23 runs function scoped async fixtures in their own loop
     created_scanners = []
     
     async def _create_scanner(api_key="valid_api_key", max_requests_per_second=0.5):
         scanner = CloudResourceScanner(
             base_url=base_url, 
             api_key=api_key,
-            max_requests_per_second=max_requests_per_second
+            max_requests_per_second=max_requests_per_second,
+            session=_session_scanner_pool
         )
         await scanner.initialize()
         created_scanners.append(scanner)
@@ -48,16 +58,26 @@ async def scanner_factory(base_url):
         except Exception:
             pass
 
-@pytest_asyncio.fixture
-async def scanner(scanner_factory):
-    # basic scanner for simple tests
-    return await scanner_factory()
+@pytest.fixture
+def scanner(base_url, api_key, _session_scanner_pool):
+    # basic scanner for simple tests - fresh per test (own token bucket and etag cache)
+    # but on the shared session; sync so it doesn't pull the test into a function scoped loop,
+    # the scanner initializes itself on its first request
+    return CloudResourceScanner(
+        base_url=base_url,
+        api_key=api_key,
+        max_requests_per_second=0.5,
+        session=_session_scanner_pool
+    )
 
 @pytest.fixture(autouse=True)
 def global_test_throttle():
-    # wait between tests to avoid hitting rate limits
-    import time
-    time.sleep(1.5)
+    # off by default - the scanner's token bucket and Retry-After handling pace requests
+    # set TEST_THROTTLE to a number of seconds to force a pause between tests
+    delay = float(os.getenv("TEST_THROTTLE", "0"))
+    if delay > 0:
+        import time
+        time.sleep(delay)
 
 # pytest config stuff
 def pytest_addoption(parser):
@@ -70,6 +90,12 @@ def pytest_configure(config):
     config.addinivalue_line("markers", "slow: mark test as slow to run")
 
 def pytest_collection_modifyitems(config, items):
+    # run every async test in the session loop so they can share one aiohttp session
+    session_loop = pytest.mark.asyncio(scope="session")
+    for item in items:
+        if pytest_asyncio.is_async_test(item):
+            item.add_marker(session_loop, append=False)
+
     if config.getoption("--runslow"):
         # --runslow given, run everything
         return